@@ -13,12 +13,13 @@ class OperationType(Enum):
 class CompressionType(Enum):
     NONE = 0
     ZLIB = 1
+    ZSTD = 2  # Requires the optional zstandard package
 
 
 @dataclass
 class CompressionConfig:
     type: CompressionType
-    level: int = 6  # Default zlib compression level
+    level: int = 6  # Default compression level, valid for both zlib (1-9) and zstd (1-22)
 
 
 class Command:
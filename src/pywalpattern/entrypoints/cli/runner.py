@@ -1,10 +1,53 @@
 import argparse
 import json
-
-import requests
+import math
+from typing import Any
 
 from pywalpattern.service.server.client import KVClient
 from pywalpattern.service.server.server import KVServer
+from pywalpattern.utils.common import get_http_session
+
+# Integers the store can log, from the smallest signed to the largest unsigned 64-bit integer
+_INT_RANGE = range(-(2**63), 2**64)
+
+
+def _parse_int(text: str) -> int:
+    value = int(text)
+    if value not in _INT_RANGE:
+        raise ValueError(f"Integer {text} does not fit in 64 bits")
+    return value
+
+
+def _parse_float(text: str) -> float:
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(f"Number {text} is not finite")
+    return value
+
+
+def _parse_constant(text: str) -> float:
+    # NaN, Infinity and -Infinity, which the store would log as null
+    raise ValueError(f"Number {text} is not finite")
+
+
+def _parse_value(text: str) -> Any:
+    """
+    Parse a value typed at the prompt as JSON, falling back to the plain string. Integers are parsed exactly,
+    orjson would turn the ones beyond 64 bits into floats and silently lose precision.
+
+    Args:
+        text (str): The value as typed.
+
+    Returns:
+        Any: The parsed value.
+
+    Raises:
+        ValueError: If the value holds an integer beyond 64 bits or a non-finite number, which the store cannot log.
+    """
+    try:
+        return json.loads(text, parse_int=_parse_int, parse_float=_parse_float, parse_constant=_parse_constant)
+    except json.JSONDecodeError:
+        return text
 
 
 def run_server():
@@ -19,7 +62,9 @@ def run_server():
 
     server = KVServer(args.host, args.port, args.data_dir, args.is_leader)
     if not args.is_leader and args.leader_address:
-        requests.post(f"http://{args.leader_address}/register_follower", json={"address": f"{args.host}:{args.port + 1}"}, timeout=10)
+        get_http_session().post(
+            f"http://{args.leader_address}/register_follower", json={"address": f"{args.host}:{args.port + 1}"}, timeout=10
+        )
 
     try:
         server.start()
@@ -76,11 +121,11 @@ def run_client():  # noqa: CCR001 C901
                     continue
 
                 key = cmd[1]
-                # Try to parse as JSON, otherwise use as string
                 try:
-                    value = json.loads(" ".join(cmd[2:]))
-                except Exception:
-                    value = " ".join(cmd[2:])
+                    value = _parse_value(" ".join(cmd[2:]))
+                except ValueError as e:
+                    print(f"Error: {e}")
+                    continue
 
                 if client.put(key, value):
                     print(f"Key: {key} stored")
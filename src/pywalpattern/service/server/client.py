@@ -1,10 +1,9 @@
-import json
 import socket
 from typing import Any
 
-import requests
-
 from pywalpattern.domain.models import Command, Response
+from pywalpattern.service.server.protocol import decode_message, recv_frame, send_message
+from pywalpattern.utils.common import get_http_session
 
 
 class KVClient:
@@ -38,6 +37,9 @@ class KVClient:
         """
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Send small request frames immediately instead of waiting for Nagle coalescing
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
             self.socket.connect((self.host, self.port))
             return True
         except Exception as e:
@@ -70,36 +72,13 @@ class KVClient:
         if not self.socket:
             raise ConnectionError("Not connected to server")
 
-        # Prepare command
-        command_data = {"command": command, **kwargs}
-        serialized = json.dumps(command_data).encode("utf-8")
-
-        # Send command length and data
-        self.socket.sendall(len(serialized).to_bytes(4, byteorder="big"))
-        self.socket.sendall(serialized)
+        send_message(self.socket, {"command": command, **kwargs})
 
-        # Receive response length
-        length_bytes = self.socket.recv(4)
-        if not length_bytes:
+        payload = recv_frame(self.socket)
+        if payload is None:
             raise ConnectionError("Connection closed by server")
 
-        length = int.from_bytes(length_bytes, byteorder="big")
-
-        # Receive response data
-        data = b""
-        remaining = length
-        while remaining > 0:
-            chunk = self.socket.recv(min(remaining, 4096))
-            if not chunk:
-                break
-            data += chunk
-            remaining -= len(chunk)
-
-        if len(data) != length:
-            raise ConnectionError("Incomplete data received from server")
-
-        # Deserialize response
-        return json.loads(data.decode("utf-8"))
+        return decode_message(payload)
 
     def get(self, key: str) -> Any:
         """
@@ -178,7 +157,9 @@ class KVClient:
             bool: True if registration was successful, False otherwise.
         """
         try:
-            response = requests.post(f"http://{leader_address}/register_follower", json={"address": f"{self.host}:{self.port}"}, timeout=10)
+            response = get_http_session().post(
+                f"http://{leader_address}/register_follower", json={"address": f"{self.host}:{self.port}"}, timeout=10
+            )
             return response.status_code == 200
         except Exception as e:
             print(f"Error registering as follower: {e}")
@@ -0,0 +1,133 @@
+import asyncio
+import socket
+from typing import Any
+
+import orjson
+
+HEADER_SIZE = 4  # Big-endian length prefix in front of every message
+
+
+def encode_message(message: Any) -> tuple[bytes, bytes]:
+    """
+    Serialize a message and build its length prefix.
+
+    Args:
+        message (Any): The message to serialize.
+
+    Returns:
+        tuple[bytes, bytes]: The length prefix and the payload, to be sent back to back
+            with a single scatter-gather write.
+    """
+    payload = orjson.dumps(message)
+    return len(payload).to_bytes(HEADER_SIZE, byteorder="big"), payload
+
+
+def decode_message(payload: bytes | bytearray | memoryview) -> Any:
+    """
+    Deserialize a message payload (without its length prefix).
+
+    Args:
+        payload (bytes | bytearray | memoryview): The payload to deserialize.
+
+    Returns:
+        Any: The deserialized message.
+    """
+    return orjson.loads(payload)
+
+
+def send_message(sock: socket.socket, message: Any) -> None:
+    """
+    Send a length-prefixed message over a socket, using one sendmsg call for the prefix and
+    the payload where the platform supports it.
+
+    Args:
+        sock (socket.socket): The connected socket.
+        message (Any): The message to send.
+    """
+    header, payload = encode_message(message)
+    if not hasattr(sock, "sendmsg"):
+        sock.sendall(header + payload)
+        return
+
+    sent = sock.sendmsg([header, payload])
+    # sendmsg may stop short on a full socket buffer, send whatever is left
+    if sent < HEADER_SIZE:
+        sock.sendall(header[sent:])
+        sock.sendall(payload)
+    elif sent < HEADER_SIZE + len(payload):
+        sock.sendall(memoryview(payload)[sent - HEADER_SIZE :])
+
+
+def recv_exactly(sock: socket.socket, length: int) -> bytearray:
+    """
+    Receive exactly `length` bytes into a preallocated buffer.
+
+    Args:
+        sock (socket.socket): The connected socket.
+        length (int): The number of bytes to receive.
+
+    Returns:
+        bytearray: The received bytes. Shorter than `length` if the peer closed the connection.
+    """
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        n = sock.recv_into(view[received:], length - received)
+        if not n:
+            return buffer[:received]
+        received += n
+    return buffer
+
+
+def recv_frame(sock: socket.socket) -> bytearray | None:
+    """
+    Receive the payload of one length-prefixed message.
+
+    Args:
+        sock (socket.socket): The connected socket.
+
+    Returns:
+        bytearray | None: The payload, or None if the peer closed the connection between messages.
+
+    Raises:
+        ConnectionError: If the peer closed the connection in the middle of a message.
+    """
+    header = recv_exactly(sock, HEADER_SIZE)
+    if not header:
+        return None
+    if len(header) != HEADER_SIZE:
+        raise ConnectionError("Incomplete message header received")
+
+    length = int.from_bytes(header, byteorder="big")
+    payload = recv_exactly(sock, length)
+    if len(payload) != length:
+        raise ConnectionError("Incomplete data received")
+    return payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes | None:
+    """
+    Read the payload of one length-prefixed message from an asyncio stream.
+
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+
+    Returns:
+        bytes | None: The payload, or None if the peer closed the connection between messages.
+
+    Raises:
+        ConnectionError: If the peer closed the connection in the middle of a message.
+    """
+    try:
+        header = await reader.readexactly(HEADER_SIZE)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise ConnectionError("Incomplete message header received") from e
+
+    length = int.from_bytes(header, byteorder="big")
+    try:
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        raise ConnectionError("Incomplete data received") from e
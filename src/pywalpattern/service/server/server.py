@@ -1,15 +1,37 @@
+import asyncio
 import contextlib
-import json
 import socket
 import threading
 import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-import requests
-from flask import Flask, jsonify, request
+import orjson
+from flask import Flask, request
+from flask import Response as FlaskResponse
+from waitress import create_server
 
-from pywalpattern.domain.models import Command, Response
+from pywalpattern.domain.models import Command, CompressionType, OperationType, Response
+from pywalpattern.service.server.protocol import decode_message, encode_message, read_frame
+from pywalpattern.service.wal.compression import get_compression_manager
 from pywalpattern.service.wal.storage import KeyValueStore
+from pywalpattern.utils.common import get_http_session
+
+REPLICATION_POOL_SIZE = 16  # Followers replicated to concurrently
+REPLICATION_BATCH_SIZE = 256
+REPLICATION_BATCH_DELAY = 0.005  # Seconds to let concurrent writes join a batch
+REPLICATION_COMPRESSION_THRESHOLD = 4096  # Batches larger than this many bytes are sent compressed
+HTTP_THREADS = 8
+LOG_CLEANUP_INTERVAL = 60  # Seconds between checks for log segments that can be deleted
+
+# Constant response bodies, serialized once
+_FOLLOWER_REGISTERED = orjson.dumps({"status": "Follower registered"})
+_ONLY_LEADER_CAN_REPLICATE = orjson.dumps({"error": "Only leader can replicate"})
+
+# Commands shipped to followers, and the operations they are applied as
+_REPLICATED_OPERATIONS = {Command.PUT: OperationType.PUT, Command.DELETE: OperationType.DELETE}
 
 
 class KVServer:
@@ -20,9 +42,13 @@ class KVServer:
         host (str): The server's hostname or IP address.
         port (int): The server's port number.
         store (KeyValueStore): The key-value store instance.
-        server_socket (socket.socket): The server's socket for accepting client connections.
+        server (asyncio.Server): The asyncio server accepting client connections.
         running (bool): A flag indicating whether the server is running.
-        clients (list): A list of active client connections.
+        clients (set[asyncio.StreamWriter]): The streams of active client connections.
+        is_leader (bool): Whether the server replicates writes to followers.
+        followers (set[str]): The addresses of registered followers.
+        http (requests.Session): The process-wide pooled HTTP session used for replication.
+        http_server: The WSGI server serving the HTTP replication endpoints.
     """
 
     def __init__(self, host: str, port: int, data_dir: str, is_leader: bool = False):
@@ -37,160 +63,261 @@ class KVServer:
         self.host = host
         self.port = port
         self.store = KeyValueStore(data_dir)
-        self.server_socket = None
+        self.server: asyncio.Server | None = None
         self.running = False
-        self.clients = []  # Track active client connections
+        self.clients: set[asyncio.StreamWriter] = set()  # Track active client connections
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._shutdown: asyncio.Event | None = None
+        self._client_tasks: set[asyncio.Task] = set()
         self.is_leader = is_leader
-        self.followers = []
+        self.followers: set[str] = set()
+        self.http = get_http_session()
+        self._replication_pool = ThreadPoolExecutor(max_workers=REPLICATION_POOL_SIZE, thread_name_prefix="replication")
+        self._replication_queue: deque[dict[str, Any]] = deque()
+        self._replication_lock = threading.Lock()
+        self._replication_ready = threading.Event()
+        self._replication_compression = get_compression_manager(CompressionType.ZLIB, 1)
+        self._command_handlers: dict[str, Callable[[dict[str, Any]], dict[str, Any]]] = {
+            Command.GET: self._get,
+            Command.PUT: self._put,
+            Command.DELETE: self._delete,
+            Command.KEYS: self._keys,
+            Command.CHECKPOINT: self._checkpoint,
+            Command.QUIT: self._quit,
+        }
         self.flask_app = Flask(__name__)
+        self.http_server = None
         self._setup_routes()
 
     def _setup_routes(self):
         @self.flask_app.route("/replicate", methods=["POST"])
         def replicate():
             if not self.is_leader:
-                return jsonify({"error": "Only leader can replicate"}), 403
-            command_data = request.json
+                return FlaskResponse(_ONLY_LEADER_CAN_REPLICATE, status=403, mimetype="application/json")
+            command_data = self._request_json()
             response = self.process_command(command_data)
-            return jsonify(response)
+            return FlaskResponse(orjson.dumps(response), mimetype="application/json")
+
+        @self.flask_app.route("/replicate_batch", methods=["POST"])
+        def replicate_batch():
+            responses = self._apply_replicated_batch(self._request_json())
+            return FlaskResponse(orjson.dumps(responses), mimetype="application/json")
 
         @self.flask_app.route("/register_follower", methods=["POST"])
         def register_follower():
-            follower_address = request.json.get("address")
-            if follower_address not in self.followers:
-                self.followers.append(follower_address)
-            return jsonify({"status": "Follower registered"})
+            follower_address = self._request_json().get("address")
+            self.followers.add(follower_address)
+            return FlaskResponse(_FOLLOWER_REGISTERED, mimetype="application/json")
+
+    def _request_json(self) -> Any:
+        """
+        Decode the JSON body of the current HTTP request, inflating it first if it was sent compressed.
+        """
+        body = request.get_data()
+        if request.headers.get("Content-Encoding") == "deflate":
+            body = self._replication_compression.decompress(body, CompressionType.ZLIB)
+        return orjson.loads(body)
+
+    def _apply_replicated_batch(self, commands: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Apply a batch of commands replicated by the leader, with a single WAL write and without queueing
+        them for replication again.
+
+        Args:
+            commands (list[dict[str, Any]]): The replicated PUT and DELETE commands, in order.
+
+        Returns:
+            list[dict[str, Any]]: The response to each command.
+        """
+        operations = [
+            (_REPLICATED_OPERATIONS[command_data.get("command")], command_data.get("key"), command_data.get("value"))
+            for command_data in commands
+        ]
+        applied = self.store.apply_batch(operations)
+        return [
+            {"status": Response.OK} if ok else {"status": Response.ERROR, "message": f"Key: {key} not found"}
+            for ok, (_, key, _) in zip(applied, operations, strict=True)
+        ]
 
     def start_flask(self):
-        self.flask_app.run(host=self.host, port=self.port + 1)
+        """
+        Serve the HTTP replication endpoints until the server is stopped.
+        """
+        self.http_server.run()
 
     def replicate_to_followers(self, command_data: dict[str, Any]):
-        for follower in self.followers:
-            try:
-                response = requests.post(f"http://{follower}/replicate", json=command_data, timeout=10)
-                if response.status_code != 200:
-                    print(f"Failed to replicate to {follower}")
-            except Exception as e:
-                print(f"Error replicating to {follower}: {e}")
+        """
+        Queue a command for replication. Queued commands are shipped to followers in batches
+        by the background replication task.
+
+        Args:
+            command_data (dict[str, Any]): The command data to replicate.
+        """
+        with self._replication_lock:
+            self._replication_queue.append(command_data)
+        self._replication_ready.set()
+
+    def _replication_task(self):
+        """
+        Background task to ship queued commands to all followers, one batch per request.
+        """
+        while self.running:
+            if not self._replication_ready.wait(timeout=1):
+                continue
+            time.sleep(REPLICATION_BATCH_DELAY)
+            batch = self._next_replication_batch()
+            if batch and self.followers:
+                self._send_batch(batch)
+
+    def _next_replication_batch(self) -> list[dict[str, Any]]:
+        with self._replication_lock:
+            batch_size = min(len(self._replication_queue), REPLICATION_BATCH_SIZE)
+            batch = [self._replication_queue.popleft() for _ in range(batch_size)]
+            if not self._replication_queue:
+                self._replication_ready.clear()
+        return batch
+
+    def _send_batch(self, batch: list[dict[str, Any]]):
+        """
+        Send a batch of commands to all followers concurrently and wait until every follower has answered.
+        """
+        payload = orjson.dumps(batch)
+        headers = {"Content-Type": "application/json"}
+        if len(payload) > REPLICATION_COMPRESSION_THRESHOLD:
+            payload, compression_type = self._replication_compression.compress(payload)
+            if compression_type == CompressionType.ZLIB:
+                headers["Content-Encoding"] = "deflate"
+
+        futures = [self._replication_pool.submit(self._replicate_to, follower, payload, headers) for follower in list(self.followers)]
+        for future in futures:
+            future.result()
+
+    def _replicate_to(self, follower: str, payload: bytes, headers: dict[str, str]):
+        try:
+            response = self.http.post(f"http://{follower}/replicate_batch", data=payload, headers=headers, timeout=10)
+            if response.status_code != 200:
+                print(f"Failed to replicate to {follower}")
+        except Exception as e:
+            print(f"Error replicating to {follower}: {e}")
 
     def start(self):
         """
         Start the server and begin accepting client connections.
         """
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
         self.running = True
-        print(f"Server started on {self.host}:{self.port}")
 
-        # Start background task for log cleanup
-        cleanup_thread = threading.Thread(target=self._log_cleanup_task)
-        cleanup_thread.daemon = True
-        cleanup_thread.start()
+        # Production WSGI server with keep-alive support, running in-process next to the store. Followers
+        # receive replicated batches on it, the leader receives follower registrations.
+        http_port = self.port + 1 if self.port else 0  # Both on ephemeral ports if the port is left to the OS
+        self.http_server = create_server(self.flask_app, host=self.host, port=http_port, threads=HTTP_THREADS)
+        flask_thread = threading.Thread(target=self.start_flask)
+        flask_thread.daemon = True
+        flask_thread.start()
 
         if self.is_leader:
-            flask_thread = threading.Thread(target=self.start_flask)
-            flask_thread.daemon = True
-            flask_thread.start()
+            replication_thread = threading.Thread(target=self._replication_task)
+            replication_thread.daemon = True
+            replication_thread.start()
 
         try:
-            while self.running:
-                client_socket, address = self.server_socket.accept()
-                print(f"Client connected from {address}")
-                client_thread = threading.Thread(target=self.handle_client, args=(client_socket, address))
-                client_thread.daemon = True
-                client_thread.start()
-                self.clients.append((client_socket, client_thread))
+            asyncio.run(self._serve())
         except KeyboardInterrupt:
             print("Server shutting down...")
         finally:
             self.stop()
 
+    async def _serve(self):
+        """
+        Accept client connections on a single event loop until the server is stopped.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._shutdown = asyncio.Event()
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port, reuse_address=True)
+        print(f"Server started on {self.host}:{self.port}")
+        cleanup_task = asyncio.create_task(self._log_cleanup_task())
+
+        async with self.server:
+            await self._shutdown.wait()
+            cleanup_task.cancel()
+            # Close all client connections and let their handlers finish
+            for writer in self.clients:
+                writer.close()
+            await asyncio.gather(cleanup_task, *self._client_tasks, return_exceptions=True)
+
     def stop(self):
         """
         Stop the server and close all client connections.
         """
         self.running = False
 
-        # Close all client connections
-        for client_socket, _ in self.clients:
-            with contextlib.suppress(Exception):
-                client_socket.close()
+        # Wake up the event loop so that it closes the server and all client connections
+        if self._loop and not self._loop.is_closed():
+            with contextlib.suppress(RuntimeError):
+                self._loop.call_soon_threadsafe(self._shutdown.set)
+
+        # Stop the HTTP replication endpoints
+        http_server, self.http_server = self.http_server, None
+        if http_server:
+            http_server.close()
 
-        # Close server socket
-        if self.server_socket:
-            self.server_socket.close()
+        # Stop replication workers. The HTTP session is shared by the whole process and stays open.
+        self._replication_pool.shutdown(wait=False)
 
         # Close the store
         self.store.close()
         print("Server stopped")
 
-    def handle_client(self, client_socket: socket.socket, address: tuple[str, int]):  # noqa: CCR001 C901
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):  # noqa: CCR001 C901
         """
         Handle a client connection, processing commands and sending responses.
 
+        Commands are executed on the default executor, since they may block on the store lock
+        or on WAL I/O, which must not stall the event loop.
+
         Args:
-            client_socket (socket.socket): The client's socket.
-            address (tuple[str, int]): The client's address.
+            reader (asyncio.StreamReader): The stream to read commands from.
+            writer (asyncio.StreamWriter): The stream to write responses to.
         """
+        address = writer.get_extra_info("peername")
+        print(f"Client connected from {address}")
+        self.clients.add(writer)
+        self._client_tasks.add(asyncio.current_task())
+        loop = asyncio.get_running_loop()
         try:
+            # asyncio already disables Nagle on TCP transports, only keep-alive has to be enabled
+            writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
             while self.running:
-                # Receive data length (4 bytes)
-                length_bytes = client_socket.recv(4)
-                if not length_bytes:
-                    break
-
-                length = int.from_bytes(length_bytes, byteorder="big")
-
-                # Receive command data
-                data = b""
-                remaining = length
-                while remaining > 0:
-                    chunk = client_socket.recv(min(remaining, 4096))
-                    if not chunk:
-                        break
-                    data += chunk
-                    remaining -= len(chunk)
-
-                if len(data) != length:
-                    print(f"Incomplete data received from {address}")
+                data = await read_frame(reader)
+                if data is None:
                     break
 
                 # Process command
                 try:
-                    command_data = json.loads(data.decode("utf-8"))
-                    response = self.process_command(command_data)
-
-                    # Serialize response
-                    response_data = json.dumps(response).encode("utf-8")
-                    response_length = len(response_data)
-
-                    # Send response length and data
-                    client_socket.sendall(response_length.to_bytes(4, byteorder="big"))
-                    client_socket.sendall(response_data)
-
-                    # If client sent QUIT, close connection
-                    if command_data.get("command") == Command.QUIT:
-                        break
-
+                    command_data = decode_message(data)
+                    response = await loop.run_in_executor(None, self.process_command, command_data)
                 except Exception as e:
                     print(f"Error processing command: {e}")
-                    error_response = {"status": Response.ERROR, "message": str(e)}
-                    response_data = json.dumps(error_response).encode("utf-8")
-                    response_length = len(response_data)
-                    client_socket.sendall(response_length.to_bytes(4, byteorder="big"))
-                    client_socket.sendall(response_data)
+                    writer.writelines(encode_message({"status": Response.ERROR, "message": str(e)}))
+                    await writer.drain()
+                    continue
 
-        except Exception as e:
+                writer.writelines(encode_message(response))
+                await writer.drain()
+
+                # If client sent QUIT, close connection
+                if command_data.get("command") == Command.QUIT:
+                    break
+
+        except OSError as e:
             print(f"Error handling client {address}: {e}")
         finally:
-            client_socket.close()
+            writer.close()
             print(f"Client {address} disconnected")
-            # Remove from active clients list
-            self.clients = [(s, t) for s, t in self.clients if s != client_socket]
+            # Remove from active clients
+            self.clients.discard(writer)
+            self._client_tasks.discard(asyncio.current_task())
 
-    def process_command(self, command_data: dict[str, Any]) -> dict[str, Any]:  # noqa: C901 CCR001
+    def process_command(self, command_data: dict[str, Any]) -> dict[str, Any]:
         """
         Process a client command and return the appropriate response.
 
@@ -200,55 +327,55 @@ class KVServer:
         Returns:
             dict[str, Any]: The response to be sent back to the client.
         """
-        command = command_data.get("command")
-
-        if command == Command.GET:
-            key = command_data.get("key")
-            value = self.store.get(key)
-            if value is not None:
-                return {"status": Response.RESULT, "value": value}
-            else:
-                return {"status": Response.ERROR, "message": f"Key: {key} not found"}
-
-        elif command == Command.PUT:
-            key = command_data.get("key")
-            value = command_data.get("value")
-            self.store.put(key, value)
-            if self.is_leader:
-                self.replicate_to_followers(command_data)
-            return {"status": Response.OK}
+        handler = self._command_handlers.get(command_data.get("command"), self._unknown_command)
+        return handler(command_data)
+
+    def _get(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        key = command_data.get("key")
+        value = self.store.get(key)
+        if value is not None:
+            return {"status": Response.RESULT, "value": value}
+        return {"status": Response.ERROR, "message": f"Key: {key} not found"}
+
+    def _put(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        self.store.put(command_data.get("key"), command_data.get("value"))
+        if self.is_leader:
+            self.replicate_to_followers(command_data)
+        return {"status": Response.OK}
 
-        elif command == Command.DELETE:
-            key = command_data.get("key")
-            success = self.store.delete(key)
-            if success:
-                if self.is_leader:
-                    self.replicate_to_followers(command_data)
-                return {"status": Response.OK}
-            else:
-                return {"status": Response.ERROR, "message": f"Key: {key} not found"}
+    def _delete(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        key = command_data.get("key")
+        if not self.store.delete(key):
+            return {"status": Response.ERROR, "message": f"Key: {key} not found"}
+        if self.is_leader:
+            self.replicate_to_followers(command_data)
+        return {"status": Response.OK}
 
-        elif command == Command.KEYS:
-            keys = list(self.store.data.keys())
-            return {"status": Response.RESULT, "keys": keys}
+    def _keys(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        return {"status": Response.RESULT, "keys": list(self.store.data.keys())}
 
-        elif command == Command.CHECKPOINT:
-            self.store.checkpoint()
-            return {"status": Response.OK}
+    def _checkpoint(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        self.store.checkpoint()
+        return {"status": Response.OK}
 
-        elif command == Command.QUIT:
-            return {"status": Response.OK, "message": "Goodbye"}
+    def _quit(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        return {"status": Response.OK, "message": "Goodbye"}
 
-        else:
-            return {"status": Response.ERROR, "message": f"Unknown command: {command}"}
+    def _unknown_command(self, command_data: dict[str, Any]) -> dict[str, Any]:
+        return {"status": Response.ERROR, "message": f"Unknown command: {command_data.get('command')}"}
 
-    def _log_cleanup_task(self):
+    async def _log_cleanup_task(self):
         """
-        Background task to periodically check and delete old log segments.
+        Background task to periodically check and delete old log segments. Cancelled when the server stops.
         """
+        loop = asyncio.get_running_loop()
         while self.running:
-            with self.store.lock:
-                low_water_mark = self.store.low_water_mark  # Use low-water mark set by checkpoint
-                snapshot_seq_num = self.store.get_snapshot_seq_num()  # Get the snapshot sequence number
-                self.store.wal.delete_old_segments(low_water_mark, snapshot_seq_num)
-            time.sleep(60)  # Run every 60 seconds
+            # Deleting segments blocks on the store lock and on file I/O, keep it off the event loop
+            await loop.run_in_executor(None, self._delete_old_segments)
+            await asyncio.sleep(LOG_CLEANUP_INTERVAL)
+
+    def _delete_old_segments(self):
+        with self.store.lock:
+            low_water_mark = self.store.low_water_mark  # Use low-water mark set by checkpoint
+            snapshot_seq_num = self.store.get_snapshot_seq_num()  # Get the snapshot sequence number
+            self.store.wal.delete_old_segments(low_water_mark, snapshot_seq_num)
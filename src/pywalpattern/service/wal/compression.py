@@ -1,18 +1,74 @@
+import functools
+import threading
 import zlib
 
 from pywalpattern.domain.models import CompressionConfig, CompressionType
 
+try:
+    import zstandard
+except ImportError:  # Optional, installed with the "zstd" extra
+    zstandard = None
+
+MIN_COMPRESSION_SIZE = 128  # Smaller payloads are stored as they are, they rarely shrink
+
 
 class CompressionManager:
     def __init__(self, config: CompressionConfig):
         self.config = config
+        if config.type == CompressionType.ZSTD:
+            _require_zstandard()
+        # zstd (de)compression contexts are expensive to create and must not be shared between threads
+        self._local = threading.local()
 
     def compress(self, data: bytes) -> tuple[bytes, CompressionType]:
-        if self.config.type == CompressionType.ZLIB:
-            return zlib.compress(data, level=self.config.level), CompressionType.ZLIB
-        return data, CompressionType.NONE
+        if self.config.type == CompressionType.NONE or len(data) < MIN_COMPRESSION_SIZE:
+            return data, CompressionType.NONE
+        if self.config.type == CompressionType.ZSTD:
+            compressed_data = self._zstd_compressor().compress(data)
+        else:
+            compressed_data = zlib.compress(data, level=self.config.level)
+        # Fall back to the raw payload when compression does not pay for itself
+        if len(compressed_data) >= len(data):
+            return data, CompressionType.NONE
+        return compressed_data, self.config.type
 
     def decompress(self, data: bytes, compression_type: CompressionType) -> bytes:
         if compression_type == CompressionType.ZLIB:
             return zlib.decompress(data)
+        if compression_type == CompressionType.ZSTD:
+            return self._zstd_decompressor().decompress(data)
         return data
+
+    def _zstd_compressor(self) -> "zstandard.ZstdCompressor":
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.config.level)
+        return compressor
+
+    def _zstd_decompressor(self) -> "zstandard.ZstdDecompressor":
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            _require_zstandard()
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ImportError("zstd compression requires the zstandard package, install pywalpattern[zstd]")
+
+
+@functools.cache
+def get_compression_manager(compression_type: CompressionType, level: int = 6) -> CompressionManager:
+    """
+    Get the shared manager for a compression type and level, so that log entries reuse one instead of
+    building their own. Managers are safe to share between threads, zstd contexts are kept per thread.
+
+    Args:
+        compression_type (CompressionType): The compression type.
+        level (int): The compression level (default is 6).
+
+    Returns:
+        CompressionManager: The shared manager.
+    """
+    return CompressionManager(CompressionConfig(compression_type, level))
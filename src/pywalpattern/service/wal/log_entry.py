@@ -1,10 +1,32 @@
 import json
+import math
+import struct
 import time
 import zlib
 from typing import Any
 
+import orjson
+
 from pywalpattern.domain.models import CompressionConfig, CompressionType, OperationType
-from pywalpattern.service.wal.compression import CompressionManager
+from pywalpattern.service.wal.compression import get_compression_manager
+
+# Format version and CRC32 of the payload, in front of every format version 2 entry
+ENTRY_HEADER = struct.Struct("!BI")
+
+# Enum members by value, indexed directly instead of going through the Enum constructor on the replay path
+_OPERATION_TYPES = {op_type.value: op_type for op_type in OperationType}
+_COMPRESSION_TYPES = {compression_type.value: compression_type for compression_type in CompressionType}
+
+
+def _is_finite(value: Any) -> bool:
+    """Check that a value holds no NaN or infinite floats, which orjson would silently write as null."""
+    if isinstance(value, float):
+        return math.isfinite(value)
+    if isinstance(value, dict):
+        return all(map(_is_finite, value.values()))
+    if isinstance(value, (list, tuple)):
+        return all(map(_is_finite, value))
+    return True
 
 
 class LogEntry:
@@ -17,12 +39,15 @@ class LogEntry:
         key (str): The key associated with the log entry.
         value (Any, optional): The value associated with the log entry (default is None).
         timestamp (float): The timestamp when the log entry was created.
-        checksum (int): The CRC checksum of the log entry.
+        checksum (int | None): The CRC checksum of the log entry, set once it is serialized or deserialized.
         format_version (int): The format version of the log entry.
         segment_num (int): The segment number of the log entry.
     """
 
-    CURRENT_FORMAT_VERSION = 1
+    # No per-instance __dict__, WAL replay and checkpoints create one entry per logged operation
+    __slots__ = ("seq_num", "op_type", "key", "value", "timestamp", "checksum", "format_version", "segment_num")
+
+    CURRENT_FORMAT_VERSION = 2  # 1: JSON object, 2: checksummed positional JSON array
 
     def __init__(
         self,
@@ -49,20 +74,20 @@ class LogEntry:
         self.key = key
         self.value = value
         self.timestamp = time.time()
-        self.checksum = self.calculate_checksum()
+        self.checksum: int | None = None
         self.format_version = format_version
         self.segment_num = segment_num
 
     def calculate_checksum(self) -> int:
-        """Calculate the CRC checksum of the log entry."""
-        data = f"{self.seq_num}{self.op_type.value}{self.key}{self.value}{self.timestamp}"
+        """Calculate the CRC checksum of the log entry fields, as stored by format version 1."""
+        data = f"{self.seq_num}{self.op_type._value_}{self.key}{self.value}{self.timestamp}"
         return zlib.crc32(data.encode("utf-8"))
 
     def to_dict(self) -> dict:
         """Convert LogEntry to a dictionary for JSON serialization"""
         return {
             "seq_num": self.seq_num,
-            "op_type": self.op_type.value,  # Store enum as integer
+            "op_type": self.op_type._value_,  # Store enum as integer
             "key": self.key,
             "value": self.value,
             "timestamp": self.timestamp,
@@ -71,14 +96,44 @@ class LogEntry:
             "segment_num": self.segment_num,
         }
 
-    @staticmethod
-    def from_dict(data: dict) -> "LogEntry":
+    def to_tuple(self) -> tuple:
+        """Convert LogEntry to a positional tuple, the compact on-disk representation. The format version is in the entry header."""
+        # Enum.value is a property, _value_ is the plain attribute behind it
+        return (
+            self.seq_num,
+            self.op_type._value_,
+            self.key,
+            self.value,
+            self.timestamp,
+            self.segment_num,
+        )
+
+    @classmethod
+    def from_tuple(cls, data: list | tuple) -> "LogEntry":
+        """Create LogEntry from its positional representation"""
+        # Restore the stored fields as they are, instead of re-deriving the timestamp in __init__
+        entry = cls.__new__(cls)
+        entry.checksum = None
+        entry.format_version = cls.CURRENT_FORMAT_VERSION
+        (
+            entry.seq_num,
+            op_type,
+            entry.key,
+            entry.value,
+            entry.timestamp,
+            entry.segment_num,
+        ) = data
+        entry.op_type = _OPERATION_TYPES[op_type]
+        return entry
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LogEntry":
         """Create LogEntry from a dictionary"""
-        format_version = data.get("format_version", LogEntry.CURRENT_FORMAT_VERSION)
+        format_version = data.get("format_version", cls.CURRENT_FORMAT_VERSION)
 
-        entry = LogEntry(
+        entry = cls(
             seq_num=data["seq_num"],
-            op_type=OperationType(data["op_type"]),  # Convert integer back to enum
+            op_type=_OPERATION_TYPES[data["op_type"]],  # Convert integer back to enum
             key=data["key"],
             value=data.get("value"),
             format_version=format_version,
@@ -88,32 +143,63 @@ class LogEntry:
         entry.segment_num = data.get("segment_num", 0)
         return entry
 
+    def _encode(self) -> bytes:
+        """Encode entry as [format_version(1 byte)][checksum(4 bytes)][JSON array], checksumming the encoded payload"""
+        if not _is_finite(self.value):
+            raise ValueError(f"Cannot log the value of key {self.key!r}: NaN and infinite floats are not supported")
+        try:
+            payload = orjson.dumps(self.to_tuple())
+        except orjson.JSONEncodeError as e:
+            # e.g. integers beyond 64 bits, which orjson does not serialize
+            raise ValueError(f"Cannot log the value of key {self.key!r}: {e}") from e
+        self.checksum = zlib.crc32(payload)
+        return ENTRY_HEADER.pack(self.CURRENT_FORMAT_VERSION, self.checksum) + payload
+
+    @classmethod
+    def _decode(cls, data: bytes) -> "LogEntry":
+        """Decode and verify an encoded entry of any supported format version"""
+        if data[0] != cls.CURRENT_FORMAT_VERSION:
+            # Format version 1 is a bare JSON object, starting with "{", checksummed over the formatted fields.
+            # It was written by the json module, which also allows integers beyond 64 bits and NaN or infinite floats.
+            entry = cls.from_dict(json.loads(data))
+            if entry.checksum != entry.calculate_checksum():
+                raise ValueError("Checksum verification failed")
+            return entry
+
+        _, checksum = ENTRY_HEADER.unpack_from(data)
+        payload = data[ENTRY_HEADER.size :]
+        if zlib.crc32(payload) != checksum:
+            raise ValueError("Checksum verification failed")
+        entry = cls.from_tuple(orjson.loads(payload))
+        entry.checksum = checksum
+        return entry
+
     def serialize(self) -> bytes:
-        """Serialize entry to JSON bytes"""
-        return json.dumps(self.to_dict()).encode("utf-8")
+        """Serialize entry to bytes"""
+        return self._encode()
 
     @staticmethod
     def deserialize(data: bytes) -> "LogEntry":
         """Deserialize bytes to LogEntry"""
-        entry_dict = json.loads(data.decode("utf-8"))
-        entry = LogEntry.from_dict(entry_dict)
-        # Verify the checksum
-        if entry.checksum != entry.calculate_checksum():
-            raise ValueError("Checksum verification failed")
-        return entry
+        return LogEntry._decode(data)
 
 
 class CompressedLogEntry(LogEntry):
+    __slots__ = ("compression_config", "_compression_manager", "compression_type")
+
     def __init__(self, *args, compression_config: CompressionConfig | None = None, **kwargs):
         super().__init__(*args, **kwargs)
-        self.compression_config = compression_config or CompressionConfig(CompressionType.NONE)
-        self._compression_manager = CompressionManager(self.compression_config)
+        if compression_config is None:
+            self._compression_manager = get_compression_manager(CompressionType.NONE)
+            compression_config = self._compression_manager.config
+        else:
+            self._compression_manager = get_compression_manager(compression_config.type, compression_config.level)
+        self.compression_config = compression_config
         self.compression_type = CompressionType.NONE
 
     def serialize(self) -> bytes:
         """Serialize and compress entry"""
-        json_data = json.dumps(self.to_dict()).encode("utf-8")
-        compressed_data, compression_type = self._compression_manager.compress(json_data)
+        compressed_data, compression_type = self._compression_manager.compress(self._encode())
         self.compression_type = compression_type
 
         # Format: [compression_type(1 byte)][compressed_data]
@@ -122,17 +208,16 @@ class CompressedLogEntry(LogEntry):
     @staticmethod
     def deserialize(data: bytes) -> LogEntry:
         """Deserialize and decompress entry"""
-        compression_type = CompressionType(data[0])
+        compression_type = _COMPRESSION_TYPES[data[0]]
         compressed_data = data[1:]
 
-        compression_manager = CompressionManager(CompressionConfig(compression_type))
+        compression_manager = get_compression_manager(compression_type)
         decompressed_data = compression_manager.decompress(compressed_data, compression_type)
 
-        entry_dict = json.loads(decompressed_data.decode("utf-8"))
-        entry = CompressedLogEntry.from_dict(entry_dict)
-
-        if entry.checksum != entry.calculate_checksum():
-            raise ValueError("Checksum verification failed")
+        entry = CompressedLogEntry._decode(decompressed_data)
+        entry.compression_config = compression_manager.config
+        entry._compression_manager = compression_manager
+        entry.compression_type = compression_type
         return entry
 
     def to_dict(self) -> dict:
@@ -140,11 +225,11 @@ class CompressedLogEntry(LogEntry):
         data["compression_type"] = self.compression_type.value
         return data
 
-    @staticmethod
-    def from_dict(data: dict) -> LogEntry:
-        compression_type = CompressionType(data.pop("compression_type", CompressionType.NONE.value))
-        entry = super(CompressedLogEntry, CompressedLogEntry).from_dict(data)
-        entry.compression_config = CompressionConfig(compression_type)
-        entry._compression_manager = CompressionManager(entry.compression_config)
+    @classmethod
+    def from_dict(cls, data: dict) -> LogEntry:
+        compression_type = _COMPRESSION_TYPES[data.pop("compression_type", CompressionType.NONE.value)]
+        entry = super().from_dict(data)
+        entry._compression_manager = get_compression_manager(compression_type)
+        entry.compression_config = entry._compression_manager.config
         entry.compression_type = compression_type
         return entry
@@ -1,12 +1,20 @@
+import itertools
 import json
 import os
 import threading
+from collections.abc import Iterable, Mapping
 from pathlib import Path
 from typing import Any
 
+import orjson
+
 from pywalpattern.domain.models import OperationType
 from pywalpattern.service.wal.wal import WAL
 
+_MISSING = object()
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+_RELOG_ENTRY_OVERHEAD = 48  # Approximate bytes per logged entry besides its key and value
+
 
 class KeyValueStore:
     """
@@ -18,99 +26,196 @@ class KeyValueStore:
         data (dict[str, Any]): The in-memory key-value store.
         lock (threading.RLock): A reentrant lock for thread-safe operations.
         low_water_mark (int): The low-water mark for WAL compaction.
+        wal_segment_size (int): The size threshold for rotating WAL files.
+        wal_flush_threshold (int): The number of buffered WAL bytes that triggers a flush to disk.
+        wal_flush_interval (float | None): The period of the background WAL flush, if any.
+        wal_min_sync_interval (float): The minimum time between two group-committed WAL writes.
     """
 
-    def __init__(self, data_dir: str):
+    def __init__(
+        self,
+        data_dir: str,
+        wal_segment_size: int = 10 * 1024 * 1024,
+        wal_flush_threshold: int = 0,
+        wal_flush_interval: float | None = None,
+        wal_min_sync_interval: float = 0.0,
+    ):
         """
         Constructs all the necessary attributes for the KeyValueStore object.
 
         Args:
             data_dir (str): The directory where data and WAL files are stored.
+            wal_segment_size (int): The size threshold for rotating WAL files (default is 10MB).
+            wal_flush_threshold (int): The number of buffered WAL bytes that triggers a flush to disk
+                (default is 0, every operation is flushed immediately).
+            wal_flush_interval (float | None): The period of the background WAL flush
+                (default is None, no background flushing).
+            wal_min_sync_interval (float): The minimum time between two group-committed WAL writes, so that
+                concurrent writers share one disk write (default is 0.0, write immediately).
         """
         self.data_dir = data_dir
+        self.wal_segment_size = wal_segment_size
+        self.wal_flush_threshold = wal_flush_threshold
+        self.wal_flush_interval = wal_flush_interval
+        self.wal_min_sync_interval = wal_min_sync_interval
         Path(data_dir).mkdir(exist_ok=True, parents=True)
 
-        self.wal = WAL(os.path.join(data_dir, "wal"))
         self.data: dict[str, Any] = {}
         self.lock = threading.RLock()
         self.low_water_mark = 0  # Initialize low-water mark
+        self._snapshot_seq_num = -1  # Sequence number of the snapshot on disk, -1 if there is none
 
         # Load snapshot if it exists
         self._load_snapshot()
 
-        # Recovery from WAL
+        # Open the WAL once and recover the operations logged after the snapshot
+        self.wal = self._open_wal()
         self._recover_from_wal()
 
+    def _open_wal(self) -> WAL:
+        """
+        Open the WAL stored under the data directory. Sequence numbers continue after the snapshot,
+        so that segments written after a checkpoint are never below its low-water mark.
+        """
+        return WAL(
+            os.path.join(self.data_dir, "wal"),
+            segment_size=self.wal_segment_size,
+            flush_threshold=self.wal_flush_threshold,
+            flush_interval=self.wal_flush_interval,
+            min_sync_interval=self.wal_min_sync_interval,
+            start_seq_num=max(self._snapshot_seq_num, 0),
+        )
+
     def _load_snapshot(self):
         """
         Load the snapshot file to restore the in-memory state.
         """
         snapshot_path = os.path.join(self.data_dir, "snapshot.json")
         if os.path.exists(snapshot_path):
-            with open(snapshot_path) as f:
-                snapshot_data = json.load(f)
+            with open(snapshot_path, "rb") as f:
+                # Snapshots written by the json module may hold integers beyond 64 bits and NaN or infinite floats,
+                # which orjson turns into floats or rejects
+                snapshot_data = json.loads(f.read())
                 self.data = snapshot_data.get("data", {})
-                self.wal.seq_num = snapshot_data.get("seq_num", 0)
-
-        # Ensure WAL is initialized after loading snapshot
-        self.wal = WAL(os.path.join(self.data_dir, "wal"))
-        self._recover_from_wal()
+                self._snapshot_seq_num = snapshot_data.get("seq_num", -1)
 
     def _recover_from_wal(self):
         """
         Apply all operations from WAL to rebuild in-memory state.
         """
-        entries = self.wal.read_all_entries()
-        for entry in entries:
-            if entry.op_type == OperationType.PUT:
-                self.data[entry.key] = entry.value
-            elif entry.op_type == OperationType.DELETE and entry.key in self.data:
-                del self.data[entry.key]
+        # Enum members are singletons, compare them by identity and keep the lookups out of the loop
+        put, delete = OperationType.PUT, OperationType.DELETE
+        data = self.data
+        for entry in self.wal.iter_entries():
+            op_type = entry.op_type
+            if op_type is put:
+                data[entry.key] = entry.value
+            elif op_type is delete:
+                data.pop(entry.key, None)
 
     def _is_snapshot_fresh(self) -> bool:
         """
         Verify if the snapshot is fresh by comparing the sequence number in the snapshot
         with the current WAL sequence number.
         """
-        snapshot_path = os.path.join(self.data_dir, "snapshot.json")
-        if not os.path.exists(snapshot_path):
-            return False
-
-        with open(snapshot_path) as f:
-            snapshot_data = json.load(f)
-
-        snapshot_seq_num = snapshot_data.get("seq_num", -1)
-        return snapshot_seq_num == self.wal.seq_num
+        return self._snapshot_seq_num == self.wal.seq_num
 
     def get_snapshot_seq_num(self) -> int:
         """
-        Get the sequence number from the snapshot file.
+        Get the sequence number from the snapshot file. The snapshot is only written by this store,
+        so the number is kept in memory instead of parsing the whole file again.
 
         Returns:
             int: The sequence number in the snapshot, or -1 if the snapshot does not exist.
         """
-        snapshot_path = os.path.join(self.data_dir, "snapshot.json")
-        if not os.path.exists(snapshot_path):
-            return -1
-
-        with open(snapshot_path) as f:
-            snapshot_data = json.load(f)
-
-        return snapshot_data.get("seq_num", -1)
+        return self._snapshot_seq_num
 
     def put(self, key: str, value: Any) -> None:
         """
-        Store a key-value pair.
+        Store a key-value pair. The value is visible to readers as soon as it is logged, this returns
+        once the log entry is on disk.
 
         Args:
             key (str): The key to store.
             value (Any): The value to store.
         """
         with self.lock:
-            # First log the operation
-            self.wal.append(OperationType.PUT, key, value)
+            wal = self.wal
+            # Skip writes that would not change the stored value. The entry that stored it may still be
+            # buffered by a concurrent writer, so the commit below waits for it either way.
+            if not self._is_unchanged(key, value):
+                # First log the operation
+                wal.append_async(OperationType.PUT, key, value)
+                # Then update in-memory state
+                self.data[key] = value
+        # Wait for the disk outside the lock, so that concurrent writers are committed together
+        wal.commit()
+
+    def put_many(self, items: Mapping[str, Any] | Iterable[tuple[str, Any]]) -> None:
+        """
+        Store several key-value pairs, logging them with a single WAL write.
+
+        Args:
+            items (Mapping[str, Any] | Iterable[tuple[str, Any]]): The key-value pairs to store.
+        """
+        items = dict(items)
+        with self.lock:
+            wal = self.wal
+            changed = {key: value for key, value in items.items() if not self._is_unchanged(key, value)}
+            if changed:
+                # First log the operations
+                wal.append_batch_async((OperationType.PUT, key, value) for key, value in changed.items())
+                # Then update in-memory state
+                self.data.update(changed)
+        wal.commit()
+
+    def apply_batch(self, operations: Iterable[tuple[OperationType, str, Any]]) -> list[bool]:
+        """
+        Apply a sequence of puts and deletes, e.g. a batch replicated from the leader, logging them
+        with a single WAL write.
+
+        Args:
+            operations (Iterable[tuple[OperationType, str, Any]]): The operation type, key and value of each operation, in order.
+
+        Returns:
+            list[bool]: Whether each operation was applied, False for deletes of keys that do not exist.
+        """
+        with self.lock:
+            wal = self.wal
+            logged, applied = self._existing_operations(operations)
+            # First log the operations
+            wal.append_batch_async(logged)
             # Then update in-memory state
-            self.data[key] = value
+            data = self.data
+            for op_type, key, value in logged:
+                if op_type is OperationType.PUT:
+                    data[key] = value
+                else:
+                    del data[key]
+        wal.commit()
+        return applied
+
+    def _existing_operations(self, operations: Iterable[tuple[OperationType, str, Any]]) -> tuple[list, list[bool]]:
+        """
+        Filter out the deletes of keys that do not exist at their point in the sequence of operations.
+        """
+        logged, applied = [], []
+        present: dict[str, bool] = {}  # Whether a key exists after the operations seen so far
+        for op_type, key, value in operations:
+            exists = present[key] if key in present else key in self.data
+            applied.append(op_type is OperationType.PUT or exists)
+            if applied[-1]:
+                present[key] = op_type is OperationType.PUT
+                logged.append((op_type, key, value))
+        return logged, applied
+
+    def _is_unchanged(self, key: str, value: Any) -> bool:
+        """
+        Check if a key already holds exactly this scalar value. Containers are not compared, and the
+        types must match, since 1, 1.0 and True compare equal but are stored differently.
+        """
+        current = self.data.get(key, _MISSING)
+        return type(current) is type(value) and isinstance(value, _SCALAR_TYPES) and current == value
 
     def get(self, key: str) -> Any | None:
         """
@@ -122,8 +227,9 @@ class KeyValueStore:
         Returns:
             Optional[Any]: The value associated with the key, or None if the key does not exist.
         """
-        with self.lock:
-            return self.data.get(key)
+        # A single dict lookup is atomic, readers do not need to wait for writers holding the lock
+        # for their WAL append. Writers update the dict in place, so a reader sees either the old or the new value.
+        return self.data.get(key)
 
     def delete(self, key: str) -> bool:
         """
@@ -136,24 +242,27 @@ class KeyValueStore:
             bool: True if the key was deleted, False if the key does not exist.
         """
         with self.lock:
-            if key not in self.data:
-                return False
-
-            # First log the operation
-            self.wal.append(OperationType.DELETE, key)
-            # Then update in-memory state
-            del self.data[key]
-            return True
+            wal = self.wal
+            deleted = key in self.data
+            if deleted:
+                # First log the operation
+                wal.append_async(OperationType.DELETE, key)
+                # Then update in-memory state
+                del self.data[key]
+        wal.commit()
+        return deleted
 
     def checkpoint(self) -> None:
         """
         Create a snapshot of the current state and compact the WAL.
         """
         with self.lock:
-            # Write current state to a snapshot file
-            snapshot_path = os.path.join(self.data_dir, "snapshot.json")
-            with open(snapshot_path, "w") as f:
-                json.dump({"seq_num": self.wal.seq_num, "data": self.data}, f)
+            # Write current state to a snapshot file. Keys that are not strings are written as JSON strings, like json.dump does
+            snapshot = orjson.dumps({"seq_num": self.wal.seq_num, "data": self.data}, option=orjson.OPT_NON_STR_KEYS)
+            self._write_snapshot(snapshot)
+            snapshot_size = len(snapshot)
+            del snapshot  # Released before the data is logged again below
+            self._snapshot_seq_num = self.wal.seq_num
 
             # Close current WAL file
             self.wal.close()
@@ -168,11 +277,47 @@ class KeyValueStore:
                 self.wal.delete_old_segments(self.low_water_mark, snapshot_seq_num)
 
             # Create new WAL
-            self.wal = WAL(os.path.join(self.data_dir, "wal"))
+            self.wal = self._open_wal()
+
+            # Log all current data to the new WAL in batches of about one segment each, estimated from the snapshot size,
+            # so that the whole store is never serialized into one buffer and the WAL still rotates between segments
+            entry_size = snapshot_size / max(len(self.data), 1) + _RELOG_ENTRY_OVERHEAD
+            batch_size = max(int(self.wal_segment_size / entry_size), 1)
+            items = iter(self.data.items())
+            while batch := list(itertools.islice(items, batch_size)):
+                self.wal.append_batch((OperationType.PUT, key, value) for key, value in batch)
 
-            # Log all current data to the new WAL
-            for key, value in self.data.items():
-                self.wal.append(OperationType.PUT, key, value)
+    def _write_snapshot(self, snapshot: bytes) -> None:
+        """
+        Replace the snapshot file atomically. The snapshot is written to a temporary file and synced to disk
+        before it takes the place of the previous one, so that a crash at any point leaves a complete
+        snapshot behind, and the WAL segments it replaces are only deleted once it is durable.
+
+        Args:
+            snapshot (bytes): The serialized snapshot.
+        """
+        snapshot_path = os.path.join(self.data_dir, "snapshot.json")
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+
+        # Make the rename itself durable, where directories can be opened
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(self.data_dir, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def flush(self) -> None:
+        """
+        Force all buffered WAL entries to disk.
+        """
+        with self.lock:
+            self.wal.flush()
 
     def close(self) -> None:
         """
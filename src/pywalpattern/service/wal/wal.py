@@ -1,10 +1,25 @@
+import mmap
 import os
+import struct
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 from typing import Any
 
 from pywalpattern.domain.models import CompressionConfig, CompressionType, OperationType
 from pywalpattern.service.wal.log_entry import CompressedLogEntry, LogEntry
 
+# With O_DSYNC every write returns only once the data is on disk, so no separate fsync is needed.
+# Platforms without it fall back to an explicit sync after each write, skipping the metadata where possible.
+_O_DSYNC = getattr(os, "O_DSYNC", 0)
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0) | _O_DSYNC
+
+# Big-endian length prefix in front of every entry
+_LENGTH = struct.Struct("!I")
+
 
 class WAL:
     """
@@ -12,12 +27,25 @@ class WAL:
 
     Attributes:
         log_dir (str): The directory where log files are stored.
-        current_file (file): The current log file being written to.
+        current_fd (int): The file descriptor of the current log file being written to.
+        current_size (int): The number of bytes written to the current log file.
         seq_num (int): The current sequence number for log entries.
         segment_size (int): The size threshold for rotating the log file.
+        flush_threshold (int): The number of buffered bytes that triggers a flush to disk.
+        flush_interval (float | None): The period of the background flush, or None to flush only from append.
+        min_sync_interval (float): The minimum time between two synchronous writes from append.
     """
 
-    def __init__(self, log_dir: str, compression_config: CompressionConfig | None = None, segment_size: int = 10 * 1024 * 1024):
+    def __init__(
+        self,
+        log_dir: str,
+        compression_config: CompressionConfig | None = None,
+        segment_size: int = 10 * 1024 * 1024,
+        flush_threshold: int = 0,
+        flush_interval: float | None = None,
+        min_sync_interval: float = 0.0,
+        start_seq_num: int = 0,
+    ):
         """
         Initializes the WAL instance, creating the log directory if it doesn't exist,
         and opening the current log file for appending.
@@ -25,40 +53,128 @@ class WAL:
         Args:
             log_dir (str): The directory where log files are stored.
             segment_size (int): The size threshold for rotating the log file (default is 10MB).
+            flush_threshold (int): The number of buffered bytes that triggers a flush to disk
+                (default is 0, every append is flushed and fsynced immediately).
+            flush_interval (float | None): If set, a background thread flushes buffered entries every
+                `flush_interval` seconds, so that appends below the flush threshold never wait for the disk
+                (default is None, no background flushing).
+            min_sync_interval (float): Appends from concurrent threads are committed together: while one
+                write is in progress, the others buffer their entries and the next writer flushes all of them
+                at once. If set, a writer also waits until `min_sync_interval` seconds have passed since the
+                previous write, so that more appends can join it (default is 0.0, write immediately).
+            start_seq_num (int): The lowest sequence number to continue from, e.g. the one covered by a snapshot,
+                if the log files on disk do not go past it (default is 0).
         """
         self.log_dir = log_dir
-        self.current_file = None
-        self.seq_num = 0
+        self.current_fd: int | None = None
+        self.current_size = 0
+        self.seq_num = start_seq_num
         self.segment_size = segment_size
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        self.min_sync_interval = min_sync_interval
+        self._last_sync = 0.0
+        self._buffered_seq_num = start_seq_num  # Sequence number of the last buffered entry
+        self._durable_seq_num = start_seq_num  # Sequence number of the last entry known to be on disk
+        self._failed: OSError | None = None  # Set once a failed write leaves the current log file unusable
+        self._flush_error: OSError | None = None  # Failure of the background flush, raised by the next commit or flush
+        self._segments: deque[int] = deque()  # Sequence numbers of the log files on disk, in ascending order
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()  # Guards the staging buffer and the sequence number
+        self._io_lock = threading.Lock()  # Guards writes to and rotation of the current log file
+        self._closed = threading.Event()
         self.compression_config = compression_config or CompressionConfig(CompressionType.ZLIB)
         Path(log_dir).mkdir(exist_ok=True, parents=True)
         self._init_from_disk()
         self._open_current_file()
 
+        self._flusher = None
+        if flush_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_task, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
     def _init_from_disk(self):
         """
         Initializes the WAL from existing log files on disk, setting the sequence number
-        to the last used sequence number.
+        to the last used sequence number. The directory is scanned only once, the list of
+        log files is kept up to date by rotation and cleanup afterwards.
         """
-        log_files = sorted([f for f in os.listdir(self.log_dir) if f.endswith(".log")])
-        if log_files:
-            last_log = log_files[-1]
-            # Extract sequence number from filename
-            try:
-                self.seq_num = int(last_log.split(".")[0])
-            except ValueError:
-                self.seq_num = 0
+        segments = []
+        with os.scandir(self.log_dir) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".log"):
+                    continue
+                # Extract sequence number from filename
+                try:
+                    segments.append(int(dir_entry.name[:-4]))
+                except ValueError:
+                    continue
+        self._segments = deque(sorted(segments))
+        if self._segments:
+            self.seq_num = max(self.seq_num, self._segments[-1])
+            self._recover_last_segment()
+        self._buffered_seq_num = self._durable_seq_num = self.seq_num
+
+    def _recover_last_segment(self):
+        """
+        Truncates an incomplete entry left at the end of the last log file by a crash. New entries would
+        otherwise be appended behind it, where reading the log stops before reaching them.
+        The sequence number continues after the last entry of the file, the file name only holds
+        the sequence number at the time the file was created.
+        """
+        log_file = self._segment_path(self._segments[-1])
+        start, end = self._scan_segment(log_file)
+        if end < os.path.getsize(log_file):
+            os.truncate(log_file, end)
+        if start == end:
+            return
+
+        with open(log_file, "rb") as f:
+            f.seek(start)
+            last_entry = CompressedLogEntry.deserialize(f.read(end - start))
+        self.seq_num = max(self.seq_num, last_entry.seq_num)
+
+    @staticmethod
+    def _scan_segment(log_file: str) -> tuple[int, int]:
+        """
+        Finds the last complete entry of a log file, following the length prefixes without decoding the entries.
+
+        Args:
+            log_file (str): The path of the log file.
+
+        Returns:
+            tuple[int, int]: The offsets of the start and the end of the last complete entry, (0, 0) if there is none.
+        """
+        with open(log_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return 0, 0  # Empty files cannot be mapped
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start = offset = 0
+                end = len(mm)
+                while offset + _LENGTH.size <= end:
+                    (length,) = _LENGTH.unpack_from(mm, offset)
+                    if offset + _LENGTH.size + length > end:
+                        break
+                    start, offset = offset + _LENGTH.size, offset + _LENGTH.size + length
+                return start, offset
 
     def _open_current_file(self):
         """
         Opens the current log file for appending, creating a new file if necessary.
         """
-        filename = os.path.join(self.log_dir, f"{self.seq_num}.log")
-        self.current_file = open(filename, "ab+")
+        self.current_fd = os.open(self._segment_path(self.seq_num), _OPEN_FLAGS, 0o644)
+        self.current_size = os.fstat(self.current_fd).st_size
+        if not self._segments or self._segments[-1] != self.seq_num:
+            self._segments.append(self.seq_num)
+
+    def _segment_path(self, seq_num: int) -> str:
+        return os.path.join(self.log_dir, f"{seq_num}.log")
 
     def append(self, op_type: OperationType, key: str, value: Any = None) -> int:
         """
-        Appends an entry to the log and returns the sequence number.
+        Appends an entry to the log and returns the sequence number. Unless a flush threshold
+        is set, the entry is on disk when this returns.
 
         Args:
             op_type (OperationType): The type of operation (e.g., PUT, DELETE).
@@ -68,57 +184,232 @@ class WAL:
         Returns:
             int: The sequence number of the appended log entry.
         """
-        self.seq_num += 1
-        entry = CompressedLogEntry(self.seq_num, op_type, key, value, compression_config=self.compression_config)
-        serialized = entry.serialize()
+        seq_num = self.append_async(op_type, key, value)
+        self.commit()
+        return seq_num
+
+    def append_async(self, op_type: OperationType, key: str, value: Any = None) -> int:
+        """
+        Buffers an entry without waiting for the disk and returns the sequence number. The entry
+        is written by the next commit, so that callers can release their own locks before waiting for it.
+
+        Args:
+            op_type (OperationType): The type of operation (e.g., PUT, DELETE).
+            key (str): The key associated with the operation.
+            value (Any, optional): The value associated with the operation (default is None).
+
+        Returns:
+            int: The sequence number of the buffered log entry.
+        """
+        return self.append_batch_async(((op_type, key, value),))[0]
+
+    def append_batch(self, operations: Iterable[tuple[OperationType, str, Any]]) -> list[int]:
+        """
+        Appends several entries to the log with a single write and returns their sequence numbers.
+
+        Args:
+            operations (Iterable[tuple[OperationType, str, Any]]): The operation type, key and value of each entry.
+
+        Returns:
+            list[int]: The sequence numbers of the appended log entries, in order.
+        """
+        seq_nums = self.append_batch_async(operations)
+        self.commit()
+        return seq_nums
+
+    def append_batch_async(self, operations: Iterable[tuple[OperationType, str, Any]]) -> list[int]:
+        """
+        Buffers several entries without waiting for the disk and returns their sequence numbers.
+        The entries are written together by the next commit.
+
+        Args:
+            operations (Iterable[tuple[OperationType, str, Any]]): The operation type, key and value of each entry.
+
+        Returns:
+            list[int]: The sequence numbers of the buffered log entries, in order.
+        """
+        seq_nums = []
+        # Serialize the whole batch first, so that an entry failing to serialize leaves nothing half-buffered
+        batch = bytearray()
+        with self._buffer_lock:
+            seq_num = self.seq_num
+            for op_type, key, value in operations:
+                seq_num += 1
+                entry = CompressedLogEntry(seq_num, op_type, key, value, compression_config=self.compression_config)
+                serialized = entry.serialize()
+
+                # Buffer entry length followed by the entry
+                batch += _LENGTH.pack(len(serialized))
+                batch += serialized
+                seq_nums.append(seq_num)
+            self.seq_num = self._buffered_seq_num = seq_num
+            self._buffer += batch
+        return seq_nums
+
+    def flush(self):
+        """
+        Writes all buffered entries to the current log file with a single synchronous write.
+
+        Raises:
+            OSError: If the entries could not be written, or a background flush failed since the last commit or flush.
+        """
+        self._raise_flush_error()
+        with self._io_lock:
+            self._write_locked()
+
+    def commit(self):
+        """
+        Writes buffered entries to disk once they reach the flush threshold, as part of a group commit.
+        With the default threshold of 0, every entry appended before this call is on disk when it returns.
+
+        Raises:
+            OSError: If the entries could not be written, even when the write was attempted by another thread,
+                or a background flush failed since the last commit or flush.
+        """
+        self._raise_flush_error()
+        seq_num = self._buffered_seq_num
+        if self._durable_seq_num >= seq_num or len(self._buffer) < self.flush_threshold:
+            return
+        with self._io_lock:
+            # The previous writer may already have flushed this append along with its own entries
+            if self._durable_seq_num < seq_num and self.min_sync_interval:
+                delay = self._last_sync + self.min_sync_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self._write_locked()
+
+    def _write_locked(self):
+        """
+        Writes the buffered entries and rotates the log file once it exceeds the segment size. Rotation
+        happens here rather than on append, so that appends never wait for the disk nor fail on a write.
+        """
+        self._flush_locked()
+        if self.current_size > self.segment_size:
+            self._rotate_locked()
+
+    def _flush_locked(self):
+        if self._failed is not None:
+            raise OSError("WAL is unusable after a failed write") from self._failed
+
+        # Swap the buffer out so that appends can continue while it is written
+        with self._buffer_lock:
+            if not self._buffer:
+                return
+            data, self._buffer = self._buffer, bytearray()
+            seq_num = self._buffered_seq_num
+
+        try:
+            with memoryview(data) as view:
+                written = 0
+                while written < len(view):
+                    written += os.write(self.current_fd, view[written:])
+            if not _O_DSYNC:
+                _fdatasync(self.current_fd)  # Force write to disk
+        except OSError:
+            self._restore_buffer(data)
+            raise
+        self.current_size += len(data)
+        self._durable_seq_num = seq_num
+        self._last_sync = time.monotonic()
+
+    def _restore_buffer(self, data: bytearray):
+        """
+        Undoes a failed write, so that the next commit retries the entries instead of acknowledging them as written.
+        Whatever part of the data reached the file is truncated away, leaving no torn entry in the middle of a segment.
+        If that fails too, the WAL is marked as failed and every later write raises.
 
-        # Write entry length followed by the entry
-        length = len(serialized)
-        self.current_file.write(length.to_bytes(4, byteorder="big"))
-        self.current_file.write(serialized)
-        self.current_file.flush()
-        os.fsync(self.current_file.fileno())  # Force write to disk
+        Args:
+            data (bytearray): The buffered entries that failed to be written.
+        """
+        try:
+            os.ftruncate(self.current_fd, self.current_size)
+        except OSError as e:
+            self._failed = e
+            return
+        with self._buffer_lock:
+            self._buffer[:0] = data
 
-        # Rotate log if it exceeds the segment size
-        if self.current_file.tell() > self.segment_size:
-            self._rotate_log()
+    def _flush_task(self):
+        """
+        Background task to periodically flush buffered entries until the WAL is closed.
+        """
+        while not self._closed.wait(self.flush_interval):
+            try:
+                with self._io_lock:
+                    self._write_locked()
+            except OSError as e:
+                # Keep the thread alive, the entries are retried on the next run. The writers are told by their next commit.
+                self._flush_error = e
 
-        return self.seq_num
+    def _raise_flush_error(self):
+        """
+        Raises the failure of the background flush once, if there was one.
+        """
+        error, self._flush_error = self._flush_error, None
+        if error is not None:
+            raise OSError(f"Background flush failed: {error}") from error
 
     def _rotate_log(self):
         """
         Rotates the log file by closing the current file and opening a new one.
         """
-        self.current_file.close()
-        self.seq_num += 1
+        with self._io_lock:
+            self._flush_locked()
+            self._rotate_locked()
+
+    def _rotate_locked(self):
+        os.close(self.current_fd)
+        with self._buffer_lock:
+            self.seq_num += 1
         self._open_current_file()
 
-    def read_all_entries(self) -> list[LogEntry]:  # noqa: CCR001
+    def read_all_entries(self) -> list[LogEntry]:
         """
         Reads all entries from all log files.
 
         Returns:
             list[LogEntry]: A list of all log entries.
         """
-        entries = []
-        log_files = sorted([os.path.join(self.log_dir, f) for f in os.listdir(self.log_dir) if f.endswith(".log")])
+        return list(self.iter_entries())
+
+    def iter_entries(self) -> Iterator[LogEntry]:
+        """
+        Lazily reads entries from all log files, one at a time, so that recovery does not
+        need to hold the whole log in memory.
 
-        for log_file in log_files:
-            with open(log_file, "rb") as f:
-                while True:
-                    length_bytes = f.read(4)
-                    if not length_bytes:
-                        break  # End of file
+        Yields:
+            LogEntry: The log entries in log order.
+        """
+        self.flush()
+        for seq_num in list(self._segments):
+            yield from self._iter_segment(self._segment_path(seq_num))
 
-                    length = int.from_bytes(length_bytes, byteorder="big")
-                    entry_data = f.read(length)
-                    if len(entry_data) != length:
-                        break  # Corrupted or incomplete entry
+    @staticmethod
+    def _iter_segment(log_file: str) -> Iterator[LogEntry]:
+        """
+        Lazily reads entries from a single log file, parsing the memory-mapped file instead of
+        issuing two reads per entry.
+
+        Args:
+            log_file (str): The path of the log file.
 
-                    entry = CompressedLogEntry.deserialize(entry_data)
-                    entries.append(entry)
+        Yields:
+            LogEntry: The entries of the log file.
+        """
+        with open(log_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return  # Empty files cannot be mapped
 
-        return entries
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset, end = 0, len(mm)
+                while offset + _LENGTH.size <= end:
+                    (length,) = _LENGTH.unpack_from(mm, offset)
+                    offset += _LENGTH.size
+                    if offset + length > end:
+                        break  # Corrupted or incomplete entry
+
+                    yield CompressedLogEntry.deserialize(mm[offset : offset + length])
+                    offset += length
 
     def _is_snapshot_fresh(self, snapshot_seq_num: int) -> bool:
         """
@@ -140,15 +431,21 @@ class WAL:
             print("Snapshot is not fresh. Skipping log cleanup.")
             return
 
-        log_files = sorted([f for f in os.listdir(self.log_dir) if f.endswith(".log")])
-        for log_file in log_files:
-            seq_num = int(log_file.split(".")[0])
-            if seq_num < low_water_mark:
-                os.remove(os.path.join(self.log_dir, log_file))
+        while self._segments and self._segments[0] < low_water_mark:
+            os.remove(self._segment_path(self._segments.popleft()))
 
     def close(self):
         """
-        Closes the current log file.
+        Flushes any buffered entries and closes the current log file.
         """
-        if self.current_file:
-            self.current_file.close()
+        self._closed.set()
+        if self._flusher:
+            self._flusher.join()
+
+        with self._io_lock:
+            if self.current_fd is not None:
+                try:
+                    self._flush_locked()
+                finally:
+                    os.close(self.current_fd)
+                    self.current_fd = None
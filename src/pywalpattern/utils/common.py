@@ -1 +1,21 @@
 """Common shared file for supplementary utils"""
+
+import functools
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = 16
+
+
+@functools.cache
+def get_http_session() -> requests.Session:
+    """
+    Get the process-wide HTTP session, so that requests to the same peer reuse keep-alive connections.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+    return session
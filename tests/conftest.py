@@ -5,6 +5,7 @@ import time
 import pytest
 
 from pywalpattern.domain.models import CompressionConfig, CompressionType
+from pywalpattern.service.wal.storage import KeyValueStore
 from pywalpattern.service.wal.wal import WAL
 
 
@@ -17,9 +18,60 @@ def wal():
         os.makedirs(log_dir)
 
     compression_config = CompressionConfig(type=CompressionType.ZLIB, level=6)
-    wal_instance = WAL(log_dir, compression_config=compression_config, segment_size=10)
+    wal_instance = WAL(log_dir, compression_config=compression_config)
 
     yield wal_instance
     # Clean up after the test has finished
+    wal_instance.close()
     if os.path.exists(log_dir):
         shutil.rmtree(log_dir)
+
+
+@pytest.fixture
+def os_write_sizes(monkeypatch):
+    """
+    Record the size of every os.write call, to count how many writes reach the log files.
+    """
+    sizes = []
+    os_write = os.write
+
+    def write(fd, data):
+        sizes.append(len(data))
+        return os_write(fd, data)
+
+    monkeypatch.setattr(os, "write", write)
+    return sizes
+
+
+@pytest.fixture
+def make_wal(tmp_path):
+    """
+    Open WAL instances in the test's temporary directory, closing all of them when the test ends.
+    """
+    wals = []
+
+    def _make_wal(**kwargs):
+        wal_instance = WAL(str(tmp_path), **kwargs)
+        wals.append(wal_instance)
+        return wal_instance
+
+    yield _make_wal
+    for wal_instance in wals:
+        wal_instance.close()
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """
+    Open KeyValueStore instances in the test's temporary directory, closing all of them when the test ends.
+    """
+    stores = []
+
+    def _make_store(**kwargs):
+        store = KeyValueStore(str(tmp_path), **kwargs)
+        stores.append(store)
+        return store
+
+    yield _make_store
+    for store in stores:
+        store.close()
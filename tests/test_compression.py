@@ -0,0 +1,39 @@
+import pytest
+
+from pywalpattern.domain.models import CompressionConfig, CompressionType, OperationType
+from pywalpattern.service.wal.compression import get_compression_manager
+from pywalpattern.service.wal.log_entry import CompressedLogEntry
+
+
+@pytest.mark.parametrize("compression_type", [CompressionType.NONE, CompressionType.ZLIB, CompressionType.ZSTD])
+def test_compression_roundtrip(compression_type):
+    if compression_type == CompressionType.ZSTD:
+        pytest.importorskip("zstandard")
+    manager = get_compression_manager(compression_type)
+    data = b"test_value" * 100
+
+    compressed_data, used_type = manager.compress(data)
+
+    assert used_type == compression_type
+    assert manager.decompress(compressed_data, used_type) == data
+
+
+def test_zstd_log_entry_roundtrip():
+    pytest.importorskip("zstandard")
+    config = CompressionConfig(CompressionType.ZSTD, level=3)
+    entry = CompressedLogEntry(seq_num=1, op_type=OperationType.PUT, key="test_key", value="test_value" * 100, compression_config=config)
+
+    deserialized_entry = CompressedLogEntry.deserialize(entry.serialize())
+
+    assert deserialized_entry.compression_type == CompressionType.ZSTD
+    assert deserialized_entry.value == entry.value
+
+
+@pytest.mark.parametrize("data", [b"short", bytes(range(256))])
+def test_incompressible_data_is_stored_uncompressed(data):
+    manager = get_compression_manager(CompressionType.ZLIB)
+
+    compressed_data, used_type = manager.compress(data)
+
+    assert used_type == CompressionType.NONE
+    assert compressed_data == data
@@ -1,7 +1,10 @@
+import json
+
+import orjson
 import pytest
 
-from pywalpattern.domain.models import OperationType
-from pywalpattern.service.wal.log_entry import LogEntry
+from pywalpattern.domain.models import CompressionConfig, CompressionType, OperationType
+from pywalpattern.service.wal.log_entry import CompressedLogEntry, LogEntry
 
 
 def test_crc_check():
@@ -31,3 +34,54 @@ def test_crc_check_fail():
     # Attempt to deserialize the tampered data and expect a ValueError
     with pytest.raises(ValueError, match="Checksum verification failed"):
         LogEntry.deserialize(tampered_data)
+
+
+def test_deserialize_legacy_dict_format():
+    # Entries written with format version 1 were serialized as JSON objects
+    entry = LogEntry(seq_num=1, op_type=OperationType.PUT, key="test_key", value="test_value", format_version=1)
+    legacy_dict = entry.to_dict()
+    legacy_dict["checksum"] = entry.calculate_checksum()
+    legacy_data = orjson.dumps(legacy_dict)
+
+    deserialized_entry = LogEntry.deserialize(legacy_data)
+
+    assert deserialized_entry.format_version == 1
+    assert deserialized_entry.key == "test_key"
+    assert deserialized_entry.value == "test_value"
+    assert deserialized_entry.checksum == legacy_dict["checksum"]
+
+
+@pytest.mark.parametrize("value", [2**70, float("inf")])
+def test_deserialize_legacy_dict_format_beyond_orjson(value):
+    # Format version 1 entries were written by the json module, with values orjson cannot represent
+    entry = LogEntry(seq_num=1, op_type=OperationType.PUT, key="test_key", value=value, format_version=1)
+    legacy_dict = entry.to_dict()
+    legacy_dict["checksum"] = entry.calculate_checksum()
+    legacy_data = json.dumps(legacy_dict).encode("utf-8")
+
+    deserialized_entry = CompressedLogEntry.deserialize(bytes([CompressionType.NONE.value]) + legacy_data)
+
+    assert deserialized_entry.value == value
+    assert type(deserialized_entry.value) is type(value)
+
+
+def test_entry_is_decoded_as_current_format_version():
+    # The version is taken from the entry header, whatever the entry was constructed with
+    entry = LogEntry(seq_num=1, op_type=OperationType.PUT, key="test_key", value="test_value", format_version=1)
+
+    deserialized_entry = LogEntry.deserialize(entry.serialize())
+
+    assert deserialized_entry.format_version == LogEntry.CURRENT_FORMAT_VERSION
+    assert deserialized_entry.value == "test_value"
+
+
+def test_compressed_entry_from_dict():
+    config = CompressionConfig(CompressionType.ZLIB)
+    entry = CompressedLogEntry(seq_num=1, op_type=OperationType.PUT, key="test_key", value="test_value", compression_config=config)
+    data = entry.to_dict()
+
+    restored_entry = CompressedLogEntry.from_dict(data)
+
+    assert isinstance(restored_entry, CompressedLogEntry)
+    assert restored_entry.key == "test_key"
+    assert restored_entry.compression_type == CompressionType.NONE
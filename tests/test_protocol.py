@@ -0,0 +1,43 @@
+import socket
+import threading
+
+import pytest
+
+from pywalpattern.service.server.protocol import decode_message, recv_frame, send_message
+
+
+def test_send_and_receive_message():
+    left, right = socket.socketpair()
+    with left, right:
+        send_message(left, {"command": "PUT", "key": "key1", "value": [1, 2, 3]})
+        payload = recv_frame(right)
+
+    assert decode_message(payload) == {"command": "PUT", "key": "key1", "value": [1, 2, 3]}
+
+
+def test_receive_returns_none_on_closed_connection():
+    left, right = socket.socketpair()
+    left.close()
+    with right:
+        assert recv_frame(right) is None
+
+
+def test_receive_incomplete_message():
+    left, right = socket.socketpair()
+    with right:
+        left.sendall((100).to_bytes(4, byteorder="big") + b"{}")
+        left.close()
+        with pytest.raises(ConnectionError, match="Incomplete data received"):
+            recv_frame(right)
+
+
+def test_send_and_receive_large_message():
+    left, right = socket.socketpair()
+    value = "x" * (4 * 1024 * 1024)
+    with left, right:
+        sender = threading.Thread(target=send_message, args=(left, {"value": value}))
+        sender.start()
+        payload = recv_frame(right)
+        sender.join()
+
+    assert decode_message(payload) == {"value": value}
@@ -0,0 +1,23 @@
+import pytest
+
+from pywalpattern.entrypoints.cli.runner import _parse_value
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [("hello", "hello"), ("42", 42), ("1.5", 1.5), ('{"a": [1, 2]}', {"a": [1, 2]}), ("18446744073709551615", 2**64 - 1)],
+)
+def test_parse_value(text, value):
+    assert _parse_value(text) == value
+
+
+@pytest.mark.parametrize("text", ["18446744073709551616", "-9223372036854775809", "[1, 18446744073709551616]"])
+def test_parse_value_rejects_integers_beyond_64_bits(text):
+    with pytest.raises(ValueError, match="does not fit in 64 bits"):
+        _parse_value(text)
+
+
+@pytest.mark.parametrize("text", ["NaN", "Infinity", "-Infinity", "1e999", '{"a": [NaN]}'])
+def test_parse_value_rejects_non_finite_numbers(text):
+    with pytest.raises(ValueError, match="is not finite"):
+        _parse_value(text)
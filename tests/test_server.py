@@ -0,0 +1,87 @@
+import threading
+import time
+
+import orjson
+import pytest
+
+from pywalpattern.domain.models import Command, CompressionConfig, CompressionType, Response
+from pywalpattern.service.server.client import KVClient
+from pywalpattern.service.server.protocol import decode_message, HEADER_SIZE, recv_frame
+from pywalpattern.service.server.server import KVServer
+from pywalpattern.service.wal.compression import CompressionManager
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = KVServer("localhost", 0, str(tmp_path))
+    yield server
+    server.stop()
+
+
+def test_process_put_get_delete(server):
+    assert server.process_command({"command": Command.PUT, "key": "key1", "value": "value1"}) == {"status": Response.OK}
+    assert server.process_command({"command": Command.GET, "key": "key1"}) == {"status": Response.RESULT, "value": "value1"}
+    assert server.process_command({"command": Command.KEYS}) == {"status": Response.RESULT, "keys": ["key1"]}
+    assert server.process_command({"command": Command.DELETE, "key": "key1"}) == {"status": Response.OK}
+    assert server.process_command({"command": Command.GET, "key": "key1"})["status"] == Response.ERROR
+
+
+def test_process_unknown_command(server):
+    response = server.process_command({"command": "UNKNOWN"})
+    assert response == {"status": Response.ERROR, "message": "Unknown command: UNKNOWN"}
+
+
+def test_replicate_batch_is_applied_with_one_write(server, os_write_sizes):
+    server.store.put("key0", "value0")
+    os_write_sizes.clear()
+
+    commands = [{"command": Command.PUT, "key": f"key{i}", "value": "x" * 100} for i in range(1, 50)]
+    commands += [{"command": Command.DELETE, "key": "key0"}, {"command": Command.DELETE, "key": "missing"}]
+    payload, compression_type = CompressionManager(CompressionConfig(CompressionType.ZLIB)).compress(orjson.dumps(commands))
+    assert compression_type == CompressionType.ZLIB
+
+    response = server.flask_app.test_client().post(
+        "/replicate_batch", data=payload, headers={"Content-Type": "application/json", "Content-Encoding": "deflate"}
+    )
+
+    assert response.status_code == 200
+    assert [r["status"] for r in response.get_json()] == [Response.OK] * 50 + [Response.ERROR]
+    assert len(os_write_sizes) == 1
+    assert server.store.get("key0") is None
+    assert len(server.store.data) == 49
+    # Replicated commands are not queued for replication again
+    assert not server._replication_queue
+
+
+def test_serve_clients_until_stopped(server):
+    thread = threading.Thread(target=server.start)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while server.server is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    port = server.server.sockets[0].getsockname()[1]
+
+    client = KVClient("localhost", port)
+    assert client.connect()
+    assert client.put("key1", "value1")
+    assert client.get("key1") == "value1"
+    assert client.keys() == ["key1"]
+
+    # A malformed frame is answered with an error and the connection stays usable
+    payload = b"not json"
+    client.socket.sendall(len(payload).to_bytes(HEADER_SIZE, byteorder="big") + payload)
+    assert decode_message(recv_frame(client.socket))["status"] == Response.ERROR
+    assert client.delete("key1")
+
+    # The server closes the connection after QUIT
+    assert client.send_command(Command.QUIT)["status"] == Response.OK
+    assert recv_frame(client.socket) is None
+    client.socket.close()
+
+    other = KVClient("localhost", port)
+    assert other.connect()
+    assert other.get("key1") is None
+    server.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    other.socket.close()
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+
+import orjson
+import pytest
+
+from pywalpattern.domain.models import OperationType
+
+
+def test_put_same_value_is_not_logged(make_store):
+    store = make_store()
+    store.put("key1", "value1")
+    seq_num = store.wal.seq_num
+
+    store.put("key1", "value1")
+    assert store.wal.seq_num == seq_num
+
+    store.put("key1", "value2")
+    assert store.wal.seq_num == seq_num + 1
+
+
+def test_put_equal_value_of_other_type_is_logged(make_store):
+    store = make_store()
+    store.put("key1", 1)
+    store.put("key1", True)
+    store.close()
+
+    store = make_store()
+    assert store.get("key1") is True
+
+
+def test_snapshot_seq_num_survives_restart(make_store):
+    store = make_store()
+    assert store.get_snapshot_seq_num() == -1
+
+    store.put("key1", "value1")
+    store.checkpoint()
+    snapshot_seq_num = store.get_snapshot_seq_num()
+    assert snapshot_seq_num >= 0
+    store.close()
+
+    store = make_store()
+    assert store.get_snapshot_seq_num() == snapshot_seq_num
+    assert store.get("key1") == "value1"
+
+
+def test_log_cleanup_after_checkpoint_keeps_new_writes(make_store):
+    store = make_store()
+    for i in range(3):
+        store.put(f"key{i}", f"value{i}")
+    store.checkpoint()
+
+    # What the server's cleanup task does periodically
+    store.wal.delete_old_segments(store.low_water_mark, store.get_snapshot_seq_num())
+    store.put("key3", "value3")
+    store.close()
+
+    store = make_store()
+    assert store.get("key3") == "value3"
+    assert len(store.data) == 4
+
+
+def test_put_many(make_store):
+    store = make_store()
+    store.put("key1", "value1")
+    seq_num = store.wal.seq_num
+
+    store.put_many({"key1": "value1", "key2": "value2", "key3": "value3"})
+    # Only the pairs that change the store are logged
+    assert store.wal.seq_num == seq_num + 2
+    store.close()
+
+    store = make_store()
+    assert store.data == {"key1": "value1", "key2": "value2", "key3": "value3"}
+
+
+def test_concurrent_puts_share_wal_writes(make_store, os_write_sizes):
+    store = make_store(wal_min_sync_interval=0.05)
+    store.put("key0", "value0")
+    os_write_sizes.clear()
+
+    threads = [threading.Thread(target=store.put, args=(f"key{i}", f"value{i}")) for i in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The store lock is not held while waiting for the disk, so the puts are committed together
+    assert len(os_write_sizes) < len(threads)
+    store.close()
+
+    store = make_store()
+    assert len(store.data) == 9
+
+
+def test_put_same_value_waits_for_pending_entry(tmp_path, make_store):
+    store = make_store()
+    # Another writer has logged the value but not committed it yet
+    with store.lock:
+        store.wal.append_async(OperationType.PUT, "key1", "value1")
+        store.data["key1"] = "value1"
+
+    wal_dir = os.path.join(str(tmp_path), "wal")
+    assert sum(os.path.getsize(os.path.join(wal_dir, name)) for name in os.listdir(wal_dir)) == 0
+
+    store.put("key1", "value1")
+    assert sum(os.path.getsize(os.path.join(wal_dir, name)) for name in os.listdir(wal_dir)) > 0
+
+
+def test_checkpoint_relogs_data_in_segments(tmp_path, make_store):
+    store = make_store(wal_segment_size=4096)
+    store.put_many({f"key{i}": "x" * 100 for i in range(200)})
+    store.checkpoint()
+
+    wal_dir = os.path.join(str(tmp_path), "wal")
+    sizes = [os.path.getsize(os.path.join(wal_dir, name)) for name in os.listdir(wal_dir)]
+    assert len(sizes) > 1
+    assert max(sizes) < 2 * 4096
+    store.close()
+
+    store = make_store()
+    assert len(store.data) == 200
+
+
+def test_put_integer_beyond_64_bits_is_rejected(make_store):
+    store = make_store()
+    seq_num = store.wal.seq_num
+
+    with pytest.raises(ValueError, match="Cannot log the value of key 'key1'"):
+        store.put("key1", 2**70)
+    assert store.get("key1") is None
+    assert store.wal.seq_num == seq_num
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), {"a": [1.0, float("-inf")]}])
+def test_put_non_finite_float_is_rejected(make_store, value):
+    store = make_store()
+    seq_num = store.wal.seq_num
+
+    with pytest.raises(ValueError, match="NaN and infinite floats are not supported"):
+        store.put("key1", value)
+    assert store.get("key1") is None
+    assert store.wal.seq_num == seq_num
+
+
+def test_load_snapshot_written_by_json_module(tmp_path, make_store):
+    data = {"big": 2**70, "inf": float("inf")}
+    with open(os.path.join(str(tmp_path), "snapshot.json"), "w") as f:
+        json.dump({"seq_num": 0, "data": data}, f)
+
+    store = make_store()
+    assert store.get("big") == 2**70
+    assert store.get("inf") == float("inf")
+
+
+def test_failed_checkpoint_keeps_previous_snapshot(tmp_path, make_store):
+    store = make_store()
+    store.put("key1", "value1")
+    store.checkpoint()
+
+    # A value orjson cannot serialize, e.g. loaded from a snapshot written by the json module
+    store.data["big"] = 2**70
+    with pytest.raises(orjson.JSONEncodeError):
+        store.checkpoint()
+    assert os.listdir(str(tmp_path)).count("snapshot.json.tmp") == 0
+    store.close()
+
+    store = make_store()
+    assert store.get("key1") == "value1"
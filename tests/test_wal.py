@@ -1,4 +1,9 @@
+import errno
 import os
+import threading
+import time
+
+import pytest
 
 from pywalpattern.domain.models import OperationType
 
@@ -25,9 +30,11 @@ def test_write_and_read_multiple_entries(wal):
 
 
 def test_log_segmentation(wal):
-    # Assuming the WAL implementation segments logs after a certain size
+    # Rotate explicitly instead of relying on a tiny segment size
     for i in range(10):
         wal.append(OperationType.PUT, f"key{i}", f"value{i}")
+        if i % 3 == 2:
+            wal._rotate_log()
 
     log_files = [f for f in os.listdir(wal.log_dir) if f.endswith(".log")]
     print(f"Log files: {log_files}")
@@ -39,3 +46,202 @@ def test_log_segmentation(wal):
     assert len(entries) == 10
     for i in range(10):
         print(f"Entry {i}: key={entries[i].key}, value={entries[i].value}")
+        assert entries[i].key == f"key{i}"
+
+
+def test_log_rotation_on_segment_size(tmp_path, make_wal):
+    wal = make_wal(segment_size=256)
+    for i in range(10):
+        wal.append(OperationType.PUT, f"key{i}", "x" * 100)
+
+    log_files = [f for f in os.listdir(str(tmp_path)) if f.endswith(".log")]
+    assert 1 < len(log_files) < 10
+    assert len(wal.read_all_entries()) == 10
+
+
+def test_buffered_entries_are_written_on_flush(tmp_path, make_wal):
+    wal = make_wal(flush_threshold=1024 * 1024)
+    wal.append(OperationType.PUT, "key1", "value1")
+    wal.append(OperationType.PUT, "key2", "value2")
+
+    log_file = os.path.join(str(tmp_path), "0.log")
+    assert os.path.getsize(log_file) == 0
+
+    wal.flush()
+    assert os.path.getsize(log_file) > 0
+
+    entries = wal.read_all_entries()
+    assert [entry.key for entry in entries] == ["key1", "key2"]
+
+
+def test_background_flush(tmp_path, make_wal):
+    wal = make_wal(flush_threshold=1024 * 1024, flush_interval=0.01)
+    wal.append(OperationType.PUT, "key1", "value1")
+
+    log_file = os.path.join(str(tmp_path), "0.log")
+    deadline = time.monotonic() + 5
+    while os.path.getsize(log_file) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.path.getsize(log_file) > 0
+
+
+def test_incomplete_trailing_entry_is_ignored(tmp_path, make_wal):
+    wal = make_wal()
+    wal.append(OperationType.PUT, "key1", "value1")
+    wal.append(OperationType.PUT, "key2", "value2")
+    wal.close()
+
+    # Simulate a crash in the middle of writing the last entry
+    log_file = os.path.join(str(tmp_path), "0.log")
+    os.truncate(log_file, os.path.getsize(log_file) - 3)
+
+    wal = make_wal()
+    assert [entry.key for entry in wal.read_all_entries()] == ["key1"]
+
+    # New entries replace the incomplete one instead of being appended behind it
+    wal.append(OperationType.PUT, "key3", "value3")
+    wal.close()
+    assert [entry.key for entry in make_wal().read_all_entries()] == ["key1", "key3"]
+
+
+def test_concurrent_appends_are_committed_together(make_wal, os_write_sizes):
+    wal = make_wal(min_sync_interval=0.05)
+    wal.append(OperationType.PUT, "key0", "value0")
+    os_write_sizes.clear()
+
+    threads = [threading.Thread(target=wal.append, args=(OperationType.PUT, f"key{i}", f"value{i}")) for i in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(os_write_sizes) < len(threads)
+    assert len(wal.read_all_entries()) == 9
+
+
+def test_append_async_is_written_on_commit(tmp_path, make_wal):
+    wal = make_wal()
+    seq_num = wal.append_async(OperationType.PUT, "key1", "value1")
+
+    log_file = os.path.join(str(tmp_path), "0.log")
+    assert os.path.getsize(log_file) == 0
+
+    wal.commit()
+    assert os.path.getsize(log_file) > 0
+    assert [entry.seq_num for entry in wal.read_all_entries()] == [seq_num]
+
+
+def test_append_batch(make_wal, os_write_sizes):
+    wal = make_wal()
+    seq_nums = wal.append_batch([(OperationType.PUT, f"key{i}", f"value{i}") for i in range(5)])
+
+    assert len(os_write_sizes) == 1
+    assert [entry.seq_num for entry in wal.read_all_entries()] == seq_nums
+
+
+def test_segments_are_ordered_numerically(make_wal):
+    wal = make_wal()
+    for i in range(12):
+        if i:
+            wal._rotate_log()
+        wal.append(OperationType.PUT, f"key{i}", f"value{i}")
+    seq_num = wal.seq_num
+    wal.close()
+
+    # Segment names go past 10.log, which sorts before 2.log as a string
+    wal = make_wal()
+    assert wal.seq_num == seq_num
+    assert [entry.key for entry in wal.read_all_entries()] == [f"key{i}" for i in range(12)]
+
+
+def test_seq_num_continues_after_last_entry(make_wal):
+    wal = make_wal()
+    seq_nums = [wal.append(OperationType.PUT, f"key{i}", f"value{i}") for i in range(3)]
+    wal.close()
+
+    # All entries are in 0.log, the sequence number has to come from the last entry rather than the file name
+    wal = make_wal()
+    seq_nums.append(wal.append(OperationType.PUT, "key3", "value3"))
+    assert seq_nums == [1, 2, 3, 4]
+    assert [entry.seq_num for entry in wal.read_all_entries()] == seq_nums
+
+
+def test_failed_write_is_not_acknowledged(make_wal, monkeypatch):
+    wal = make_wal(min_sync_interval=0.05)
+    wal.append(OperationType.PUT, "key0", "value0")
+
+    # The first write is cut short and the retry fails, as when the disk fills up mid-write
+    calls = []
+    os_write = os.write
+
+    def write(fd, data):
+        calls.append(len(data))
+        if len(calls) == 1:
+            return os_write(fd, data[: len(data) // 2])
+        if len(calls) == 2:
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        return os_write(fd, data)
+
+    monkeypatch.setattr(os, "write", write)
+
+    acknowledged, failed = [], []
+
+    def append(key):
+        try:
+            wal.append(OperationType.PUT, key, "value")
+        except OSError:
+            failed.append(key)
+        else:
+            acknowledged.append(key)
+
+    threads = [threading.Thread(target=append, args=(f"key{i}",)) for i in range(1, 6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wal.close()
+
+    assert failed
+    keys = [entry.key for entry in make_wal().read_all_entries()]
+    # No torn entry is left behind, and every acknowledged append is on disk
+    assert keys[0] == "key0"
+    assert set(acknowledged) <= set(keys)
+
+
+def test_background_flush_survives_failed_write(tmp_path, make_wal, monkeypatch):
+    wal = make_wal(flush_threshold=1024 * 1024, flush_interval=0.01)
+
+    calls = []
+    os_write = os.write
+
+    def write(fd, data):
+        calls.append(len(data))
+        if len(calls) == 1:
+            raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+        return os_write(fd, data)
+
+    monkeypatch.setattr(os, "write", write)
+    wal.append(OperationType.PUT, "key1", "value1")
+
+    # The flusher keeps running and writes the entry on its next run
+    log_file = os.path.join(str(tmp_path), "0.log")
+    deadline = time.monotonic() + 5
+    while os.path.getsize(log_file) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert os.path.getsize(log_file) > 0
+
+    # The failure is reported once, by the next commit
+    with pytest.raises(OSError, match="Background flush failed"):
+        wal.commit()
+    wal.commit()
+
+
+def test_append_async_does_not_rotate(tmp_path, make_wal, os_write_sizes):
+    wal = make_wal(segment_size=256)
+    wal.append_batch_async([(OperationType.PUT, f"key{i}", "x" * 100) for i in range(5)])
+    # Past the segment size, but nothing is written until the commit
+    assert not os_write_sizes
+
+    wal.commit()
+    assert len(os_write_sizes) == 1
+    assert len([f for f in os.listdir(str(tmp_path)) if f.endswith(".log")]) == 2